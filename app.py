@@ -1,175 +1,94 @@
 import streamlit as st
-import requests, time, json, datetime
+import datetime
+import pandas as pd
+from basicops_client import (
+    FLAVOR, DEBUG, LOGIN_URL, restore_session, handle_oauth_callback,
+    logged_in, api_post, api_post_many,
+    get_projects, warm_project_fields, project_fields, refresh_project_cache,
+)
 
 """
 BasicOps Forms – **FULL DEBUG v2**
 ---------------------------------
 • Fix NBSP typo that broke Python parsing
 • If `fields` not returned inline, call `/project/{id}/fields`
-• Keeps verbose logging and envelope handling
+• Verbose HTTP trace only when the sidebar Debug box is ticked
+• Keeps envelope handling
+• API/OAuth plumbing and project/field loading live in `basicops_client.py`
 """
 
 # ── CONFIG ───────────────────────────────────────────────
-API_BASE     = "https://api.basicops.com/v1"
-AUTH_URL     = "https://app.basicops.com/oauth/auth"
-TOKEN_URL    = "https://api.basicops.com/oauth/token"
-CLIENT_ID    = st.secrets["basicops_client_id"]
-CLIENT_SEC   = st.secrets["basicops_client_secret"]
-REDIRECT_URI = st.secrets["basicops_redirect_uri"]
+GRID_THRESHOLD = 10   # more custom fields than this → one st.data_editor grid
 
 st.set_page_config("BasicOps Forms – DEBUG", layout="centered")
 st.title("📝 BasicOps Task Form (OAuth) — DEBUG")
 
-# ── TOKEN HELPERS ───────────────────────────────────────
-
-def save_tokens(tok: dict):
-    st.session_state.update({
-        "access_token":  tok["access_token"],
-        "refresh_token": tok.get("refresh_token"),
-        "expires_at":    time.time() + tok.get("expires_in", 3600) - 60,
-    })
-
-def token_valid():
-    return "access_token" in st.session_state and time.time() < st.session_state.get("expires_at", 0)
-
-def refresh_token():
-    if "refresh_token" not in st.session_state:
-        return False
-    st.write("↻ Refreshing token …")
-    r = requests.post(TOKEN_URL, data={
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SEC,
-        "redirect_uri": REDIRECT_URI,
-        "grant_type": "refresh_token",
-        "refresh_token": st.session_state["refresh_token"],
-    }, timeout=10)
-    st.write("Refresh status", r.status_code)
-    st.write(r.text[:300])
-    if r.ok and r.json().get("access_token"):
-        save_tokens(r.json())
-        return True
-    return False
-
-def ensure_token():
-    if not token_valid() and not refresh_token():
-        st.warning("Token missing or expired — click Connect")
-        st.stop()
-
-# ── API WRAPPERS WITH DEBUG ────────────────────────────
-
-def api_get(path: str):
-    ensure_token()
-    url = f"{API_BASE}{path}"
-    st.write("GET", url)
-    r = requests.get(url, headers={"Authorization": f"Bearer {st.session_state['access_token']}"}, timeout=10)
-    st.write("Status", r.status_code)
-    st.write(r.text[:300])
-    if not r.ok:
-        st.error(f"GET failed → {r.status_code}")
-        st.stop()
-    try:
-        return r.json()
-    except Exception:
-        st.error("Response was not JSON (snippet above)")
-        st.stop()
-
-
-def api_post(path: str, payload: dict):
-    ensure_token()
-    url = f"{API_BASE}{path}"
-    st.write("POST", url)
-    st.write("Payload", payload)
-    r = requests.post(
-        url,
-        headers={
-            "Authorization": f"Bearer {st.session_state['access_token']}",
-            "Content-Type": "application/json",
-        },
-        data=json.dumps(payload),
-        timeout=10,
-    )
-    st.write("Status", r.status_code)
-    st.write(r.text[:300])
-    if not r.ok:
-        st.error("POST failed — see above")
-        st.stop()
-    return r.json()
+debug = st.sidebar.checkbox("Debug", value=DEBUG, key="debug")
+st.session_state["http_trace"] = []
 
 # ── OAUTH CODE FLOW ────────────────────────────────────
-if "code" in st.query_params and "access_token" not in st.session_state:
-    code = st.query_params["code"]
-    st.write("OAuth code received", code)
-    r = requests.post(TOKEN_URL, data={
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SEC,
-        "redirect_uri": REDIRECT_URI,
-        "grant_type": "authorization_code",
-        "code": code,
-    }, timeout=10)
-    st.write("Token exchange status", r.status_code)
-    st.write(r.text[:300])
-    if r.ok and r.json().get("access_token"):
-        save_tokens(r.json())
-        st.query_params.clear()
-        st.experimental_rerun()
-    else:
-        st.error("Token exchange failed — details above")
-        st.stop()
+restore_session()        # login cookie first — a reload needs no code exchange
+handle_oauth_callback()
 
 # ── LOGIN BUTTON ───────────────────────────────────────
-if not token_valid():
-    auth = f"{AUTH_URL}?client_id={CLIENT_ID}&response_type=code&redirect_uri={REDIRECT_URI}"
-    st.markdown(f"[🔑 Connect to BasicOps]({auth})", unsafe_allow_html=True)
+if not logged_in():
+    st.markdown(f"[🔑 Connect to BasicOps]({LOGIN_URL})", unsafe_allow_html=True)
     st.stop()
 
 st.success("Connected — token valid ✅")
+if st.button("↻ Refresh projects"):
+    refresh_project_cache()
 
 # ── PROJECT LIST (enveloped) ───────────────────────────
-proj_resp = api_get("/project?limit=100")
-proj_data = proj_resp.get("data", []) if isinstance(proj_resp, dict) else proj_resp
+proj_resp, proj_names, proj_ids = get_projects()
 
-st.write("🔍 Raw project response", proj_resp)
+if debug:
+    st.write("🔍 Raw project response", proj_resp)
 
-if not isinstance(proj_data, list) or not proj_data:
+if not proj_ids:
     st.error("Project list empty or unexpected shape.")
     st.stop()
 
-proj_map = {p.get("title", f"Unnamed {i}"): p["id"] for i, p in enumerate(proj_data)}
-sel_name = st.selectbox("Select a Project", list(proj_map.keys()))
-proj_id = proj_map[sel_name]  # NBSP removed
+warm_project_fields(proj_ids)
 
-# ── PROJECT DETAIL & FIELD FETCH ───────────────────────
-proj_detail_resp = api_get(f"/project/{proj_id}")
-p_detail = proj_detail_resp.get("data", {}) if isinstance(proj_detail_resp, dict) else proj_detail_resp
-fields = p_detail.get("fields", [])
+sel_idx = st.selectbox("Select a Project", range(len(proj_ids)), format_func=proj_names.__getitem__)
+proj_id = proj_ids[sel_idx]
 
-# fallback: explicit fields endpoint if inline empty
-if not fields:
-    field_resp = api_get(f"/project/{proj_id}/fields")
-    fields = field_resp.get("data", field_resp) if isinstance(field_resp, dict) else field_resp
+# ── PROJECT DETAIL & FIELD FETCH ───────────────────────
+fields = project_fields(proj_id)
 
-st.write("🧩 Full project detail", p_detail)
-st.write("🔍 Fields for project", fields)
+if debug:
+    st.write("🔍 Fields for project", fields)
 
 if not fields:
     st.warning("No custom fields found; only base title/desc will be used.")
 
 # ── DYNAMIC FORM ───────────────────────────────────────
-with st.form("task_form"):
-    base_title = st.text_input("Task title")
-    base_desc = st.text_area("Description")
-
+def normalized_fields(proj_id, fields: list) -> tuple:
+    """Per project, once: ((fid, label, type, option labels, value by label), …).
+
+    The render loops below read these tuples instead of the raw JSON dicts.
+    """
+    norm = st.session_state.setdefault("norm_fields", {})
+    if proj_id not in norm:
+        rows = []
+        for f in fields:
+            values = {o["label"]: o["value"] for o in f.get("options", [])}
+            rows.append((f["id"], f.get("label", f["id"]), f.get("type", "text"), tuple(values), values))
+        norm[proj_id] = tuple(rows)
+    return norm[proj_id]
+
+def widget_inputs(norm: tuple) -> dict:
+    """One Streamlit widget per custom field."""
     field_values = {}
-    for f in fields:
-        fid, flabel, ftype = f["id"], f.get("label", fid), f.get("type", "text")
+    for fid, flabel, ftype, labels, values in norm:
         if ftype in ("singleline", "text"):
             field_values[fid] = st.text_input(flabel, key=fid)
         elif ftype == "multiline":
             field_values[fid] = st.text_area(flabel, key=fid)
         elif ftype == "select":
-            opts = {o["label"]: o["value"] for o in f.get("options", [])}
-            choice = st.selectbox(flabel, list(opts.keys()) or ["-- none --"], key=fid)
-            field_values[fid] = opts.get(choice)
+            choice = st.selectbox(flabel, labels or ("-- none --",), key=fid)
+            field_values[fid] = values.get(choice)
         elif ftype == "checkbox":
             field_values[fid] = st.checkbox(flabel, key=fid)
         elif ftype == "date":
@@ -180,17 +99,95 @@ with st.form("task_form"):
         else:
             st.warning(f"Unknown field type '{ftype}' — using text input")
             field_values[fid] = st.text_input(flabel, key=fid)
+    return field_values
+
+def grid_inputs(norm: tuple) -> dict:
+    """All custom fields as one editable row — a single component instead of N widgets."""
+    cfg, row, dates = {}, {}, []
+    for fid, flabel, ftype, labels, _ in norm:
+        col = str(fid)
+        if ftype == "select":
+            cfg[col] = st.column_config.SelectboxColumn(flabel, options=labels)
+            row[col] = None
+        elif ftype == "checkbox":
+            cfg[col] = st.column_config.CheckboxColumn(flabel)
+            row[col] = False
+        elif ftype == "date":
+            cfg[col] = st.column_config.DateColumn(flabel)
+            row[col] = pd.NaT
+            dates.append(col)
+        elif ftype == "number":
+            cfg[col] = st.column_config.NumberColumn(flabel)
+            row[col] = None
+        else:
+            cfg[col] = st.column_config.TextColumn(flabel)
+            row[col] = ""
+    # an all-empty column is object dtype, which the editor hands back as a
+    # string (or drops); datetime64 keeps picked dates as Timestamps
+    df = pd.DataFrame([row]).astype({col: "datetime64[ns]" for col in dates})
+    edited = st.data_editor(df, column_config=cfg, num_rows="fixed", hide_index=True)
+    raw = edited.iloc[0].to_dict()
+
+    field_values = {}
+    for fid, _, ftype, _, values in norm:
+        v = raw[str(fid)]
+        if ftype == "select":
+            field_values[fid] = values.get(v)
+        elif ftype == "checkbox":
+            field_values[fid] = bool(v)
+        elif ftype == "date":
+            d = pd.to_datetime(v, errors="coerce")
+            field_values[fid] = "" if pd.isna(d) else d.date().isoformat()
+        elif ftype == "number":
+            field_values[fid] = None if pd.isna(v) else float(v)
+        else:
+            field_values[fid] = "" if pd.isna(v) else str(v)
+    return field_values
+
+# A fragment: widget interaction inside it reruns only this block, not the
+# project list / detail fetches above.
+@st.fragment
+def task_form(fields: list, proj_id):
+    norm = normalized_fields(proj_id, fields)
+    with st.form("task_form"):
+        base_title = st.text_input("Task title")
+        base_desc = st.text_area("Description")
+
+        if len(norm) > GRID_THRESHOLD:
+            field_values = grid_inputs(norm)
+        else:
+            field_values = widget_inputs(norm)
 
-    submitted = st.form_submit_button("Create Task")
+        create_col, queue_col = st.columns(2)
+        submitted = create_col.form_submit_button("Create Task")
+        queued = queue_col.form_submit_button("Queue")
 
-if submitted:
     payload = {
         "title": base_title or "Untitled Task",
         "description": base_desc,
         "project": proj_id,
         "fields": field_values,
     }
-    st.write("Submitting payload", payload)
-    new_task = api_post("/task", payload)
-    st.success(f"✅ Task created: {new_task.get('data', {}).get('id', 'unknown')}")
-    st.balloons()
+    if submitted:
+        new_task = api_post("/task", payload)
+        st.toast(f"Task #{FLAVOR.unwrap(new_task, {}).get('id', 'unknown')} created", icon="✅")
+    elif queued:
+        st.session_state.setdefault("queue", []).append(payload)
+
+    # bulk entry: queued tasks go out in one batched POST
+    queue = st.session_state.get("queue", [])
+    if queue and st.button(f"Flush ({len(queue)})"):
+        results = api_post_many("/task", queue)
+        for p, (ok, body) in zip(queue, results):
+            if ok:
+                st.success(f"✅ {p['title']} → #{FLAVOR.unwrap(body, {}).get('id', 'unknown')}")
+            else:
+                st.error(f"❌ {p['title']}: {body}")
+        st.session_state["queue"] = [p for p, (ok, _) in zip(queue, results) if not ok]
+
+
+task_form(fields, proj_id)
+
+# ── HTTP TRACE (debug only) ────────────────────────────
+if debug:
+    st.sidebar.expander("HTTP trace").code("\n".join(st.session_state["http_trace"]), language=None)
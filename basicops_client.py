@@ -0,0 +1,658 @@
+import streamlit as st
+import streamlit.components.v1 as components
+import httpx, orjson, asyncio, time, hashlib, logging, threading, base64
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlencode, urlsplit, parse_qsl
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+"""
+BasicOps API client shared by the form pages
+--------------------------------------------
+• OAuth token storage / refresh in `st.session_state`, persisted in an
+  encrypted cookie so a browser reload keeps the login
+• HTTP trace goes to the `basicops` logger (and the sidebar when Debug is on)
+• Pooled HTTP/2 client, cached GETs, batched/concurrent project prefetch
+• `ApiFlavor` absorbs the v1/v2 differences (base URL, envelope key, title key)
+"""
+
+# ── CONFIG ───────────────────────────────────────────────
+AUTH_URL     = "https://app.basicops.com/oauth/auth"
+TOKEN_URL    = "https://api.basicops.com/oauth/token"
+CLIENT_ID    = st.secrets["basicops_client_id"]
+CLIENT_SEC   = st.secrets["basicops_client_secret"]
+REDIRECT_URI = st.secrets["basicops_redirect_uri"]
+COOKIE_PASS  = st.secrets["basicops_cookie_password"]
+LOGIN_URL    = f"{AUTH_URL}?" + urlencode({
+    "client_id": CLIENT_ID,
+    "response_type": "code",
+    "redirect_uri": REDIRECT_URI,
+})
+SESSION_DAYS = 14   # the login cookie outlives many hourly access tokens
+CACHE_TTL    = 300  # seconds GET responses stay memoized (see refresh_project_cache)
+
+
+@dataclass(frozen=True)
+class ApiFlavor:
+    api_base:  str = "https://api.basicops.com/v1"
+    list_key:  str = "data"     # response envelope key ("data" on v1, "items" on v2)
+    title_key: str = "title"    # project display name ("title" on v1, "name" on v2)
+
+    @classmethod
+    def from_secrets(cls) -> "ApiFlavor":
+        return cls(
+            api_base=st.secrets.get("basicops_api_base", cls.api_base),
+            list_key=st.secrets.get("basicops_list_key", cls.list_key),
+            title_key=st.secrets.get("basicops_title_key", cls.title_key),
+        )
+
+    def unwrap(self, resp, default):
+        """Strip the response envelope, tolerating bare (un-enveloped) payloads."""
+        return resp.get(self.list_key, default) if isinstance(resp, dict) else resp
+
+
+FLAVOR   = ApiFlavor.from_secrets()
+API_BASE = FLAVOR.api_base
+
+# ── TRACE LOGGING ───────────────────────────────────────
+logger = logging.getLogger("basicops")
+
+DEBUG  = st.secrets.get("debug", False)   # default for the sidebar Debug box
+
+# the logger level is process-wide, so only the secret sets it; the sidebar box
+# is per session and only decides what reaches that session's page trace
+logging.basicConfig()
+logger.setLevel(logging.DEBUG if DEBUG else logging.WARNING)
+
+def tracing() -> bool:
+    return st.session_state.get("debug", DEBUG)
+
+def trace(msg: str, *args):
+    """Mirror an HTTP trace line to the page (and the log) — only while this session debugs."""
+    if not tracing():
+        return
+    logger.debug(msg, *args)
+    st.session_state.setdefault("http_trace", []).append(msg % args)
+
+def _redacted(token: str) -> str:
+    return f"Bearer {token[:6]}…"
+
+# ── HTTP CLIENT (keep-alive) ────────────────────────────
+
+HTTP_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "br, gzip",   # httpx decodes br when the brotli package is installed
+    "User-Agent": "basicops-forms",
+}
+
+@st.cache_resource
+def get_client() -> httpx.Client:
+    """Shared HTTP/2 client for API and token calls; its pool survives reruns.
+
+    The transport retries failed connects; HTTP status codes are not retried.
+    """
+    return httpx.Client(
+        transport=httpx.HTTPTransport(
+            http2=True,
+            retries=2,
+            limits=httpx.Limits(max_keepalive_connections=10),
+        ),
+        timeout=10,
+        headers=HTTP_HEADERS,
+    )
+
+CLIENT = get_client()
+
+try:   # faster event loop for the async prefetch; optional, and absent on Windows
+    from uvloop import run as _run_async
+except ImportError:
+    _run_async = asyncio.run
+
+# ── TOKEN HELPERS ───────────────────────────────────────
+REFRESH_LEAD  = 120   # seconds before expiry the background refresh fires
+TOKEN_RECHECK = 5     # seconds a passed ensure_token() check is trusted
+
+def exchange(grant_type: str, **extra) -> dict:
+    """POST the token endpoint over the shared client → token dict, {} on failure.
+
+    Logger only (no `trace`): the background refresher calls this off-script.
+    The response body holds tokens and is never logged.
+    """
+    r = CLIENT.post(TOKEN_URL, data={
+        "client_id": CLIENT_ID,
+        "client_secret": CLIENT_SEC,
+        "redirect_uri": REDIRECT_URI,
+        "grant_type": grant_type,
+        **extra,
+    })
+    logger.debug("token %s → %s", grant_type, r.status_code)
+    if not r.is_success:
+        return {}
+    try:
+        return orjson.loads(r.content)
+    except orjson.JSONDecodeError:
+        return {}
+
+
+class _BackgroundRefresher:
+    """Refreshes the token on a timer thread shortly before it expires.
+
+    The timer thread has no script context, so it never touches
+    `st.session_state`: the new token is parked here and applied by
+    `token_valid()` on the next run.  One instance per browser session; a
+    timer that outlives its tab does nothing.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timer = None
+        self.fire_at = 0.0
+        self.result = None
+        ctx = get_script_run_ctx()
+        self.session_id = ctx.session_id if ctx else None
+
+    def schedule(self, delay: float, refresh_tok: str):
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+            self.result = None
+            self.fire_at = time.time() + delay
+            self.timer = threading.Timer(delay, self._run, args=(refresh_tok,))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def cancel(self):
+        """Stop a pending timer, or wait out one that is already refreshing."""
+        with self.lock:
+            timer, self.timer = self.timer, None
+        if timer:
+            timer.cancel()
+            timer.join(timeout=10)
+
+    def _session_alive(self) -> bool:
+        try:
+            return Runtime.instance().is_active_session(self.session_id)
+        except Exception:
+            return True   # no runtime to ask (bare mode): assume the tab is open
+
+    def _run(self, refresh_tok: str):
+        if not self._session_alive():
+            logger.debug("background refresh skipped: session %s has ended", self.session_id)
+            return
+        try:
+            tok = exchange("refresh_token", refresh_token=refresh_tok)
+        except Exception as exc:
+            logger.debug("background refresh failed: %s", exc)
+            tok = None
+        if tok and tok.get("access_token"):
+            with self.lock:
+                self.result = tok
+
+    def take(self, wait: bool = False):
+        """Pop a finished refresh; with `wait`, block on one that is already due."""
+        timer = self.timer
+        if wait and timer and time.time() >= self.fire_at:
+            timer.join(timeout=10)
+        with self.lock:
+            tok, self.result = self.result, None
+        return tok
+
+
+def _schedule_refresh():
+    if st.session_state.get("refresh_token"):
+        refresher = st.session_state.setdefault("_bg_refresher", _BackgroundRefresher())
+        lifetime = st.session_state["expires_at"] + 60 - time.time()
+        # short-lived tokens (≤ REFRESH_LEAD) would otherwise refresh at once, every run
+        delay = max(lifetime - REFRESH_LEAD, lifetime / 2)
+        refresher.schedule(max(0, delay), st.session_state["refresh_token"])
+
+def save_tokens(tok: dict):
+    st.session_state.update({
+        "access_token":  tok["access_token"],
+        "refresh_token": tok.get("refresh_token"),
+        "expires_at":    time.time() + tok.get("expires_in", 3600) - 60,
+    })
+    st.session_state.setdefault("session_expires", time.time() + SESSION_DAYS * 86400)
+    _schedule_refresh()
+    _persist_tokens()
+
+# ── LOGIN COOKIE ────────────────────────────────────────
+# Read through st.context.cookies (the browser's cookies as of page load) and
+# written from a zero-height component; the value is Fernet-sealed JSON.
+COOKIE_NAME    = "basicops_tokens"
+_COOKIE_FIELDS = ("access_token", "refresh_token", "expires_at", "session_expires")
+
+@st.cache_resource
+def _fernet() -> Fernet:
+    # PBKDF2 is slow on purpose: derive the key once per process
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=b"basicops/", iterations=390_000)
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(COOKIE_PASS.encode())))
+
+def _write_cookie(value: str, max_age: int):
+    """Set the login cookie in the browser; `max_age=0` deletes it."""
+    cookie = f"{COOKIE_NAME}={value}; path=/; max-age={max_age}; SameSite=Strict"
+    components.html(f"<script>window.parent.document.cookie = {orjson.dumps(cookie).decode()};</script>", height=0)
+
+def restore_session():
+    """Reload tokens from the encrypted login cookie.
+
+    Call once per run, before the `?code=` flow or any token check.  A fresh
+    `?code=` always wins over the cookie, and a restored session whose token
+    cannot be refreshed is forgotten so the Connect link works again.
+    """
+    if ("code" in st.query_params or "access_token" in st.session_state
+            or st.session_state.get("_cookie_dropped")):
+        return
+    sealed = st.context.cookies.get(COOKIE_NAME)
+    if not sealed:
+        return
+    try:
+        saved = orjson.loads(_fernet().decrypt(sealed.encode()))
+    except (InvalidToken, orjson.JSONDecodeError):
+        return
+    if saved.get("session_expires", 0) < time.time():
+        return
+    st.session_state.update({k: saved.get(k) for k in _COOKIE_FIELDS})
+    trace("tokens restored from cookie")
+    if time.time() < st.session_state["expires_at"]:
+        _schedule_refresh()
+    elif not refresh_token():   # stale: refresh here, synchronously, not on a timer
+        trace("restored session could not be refreshed")
+        _forget_tokens()
+
+def _forget_tokens():
+    for k in _COOKIE_FIELDS:
+        st.session_state.pop(k, None)
+    # st.context.cookies keeps the page-load value, so remember not to reload it
+    st.session_state["_cookie_dropped"] = True
+    _write_cookie("", 0)
+
+def _persist_tokens():
+    st.session_state.pop("_cookie_dropped", None)
+    sealed = _fernet().encrypt(orjson.dumps({k: st.session_state.get(k) for k in _COOKIE_FIELDS}))
+    max_age = int(st.session_state["session_expires"] - time.time())
+    _write_cookie(sealed.decode(), max(0, max_age))
+
+def _collect_background_refresh(wait: bool = False):
+    refresher = st.session_state.get("_bg_refresher")
+    tok = refresher and refresher.take(wait)
+    if tok:
+        trace("applied background token refresh")
+        save_tokens(tok)
+
+def token_valid():
+    _collect_background_refresh()
+    return "access_token" in st.session_state and time.time() < st.session_state.get("expires_at", 0)
+
+def refresh_token():
+    if not st.session_state.get("refresh_token"):
+        return False
+    refresher = st.session_state.get("_bg_refresher")
+    if refresher:
+        refresher.cancel()   # refresh tokens are single-use: never race the timer
+        _collect_background_refresh()
+        if token_valid():
+            return True
+    trace("refreshing token")
+    tok = exchange("refresh_token", refresh_token=st.session_state["refresh_token"])
+    if tok.get("access_token"):
+        save_tokens(tok)
+        return True
+    return False
+
+def ensure_token():
+    # a check that passed moments ago is trusted (expires_at already keeps 60s
+    # of slack), so several API calls in one rerun validate only once
+    now = time.monotonic()
+    if "access_token" in st.session_state and now - st.session_state.get("_token_checked", -TOKEN_RECHECK) < TOKEN_RECHECK:
+        return
+    if not logged_in():
+        st.warning("Token missing or expired — click Connect")
+        st.stop()
+    st.session_state["_token_checked"] = now
+
+def logged_in():
+    """True once a usable access token is in session_state, refreshing if needed."""
+    # fast path: the background timer normally refreshed us already
+    if token_valid():
+        return True
+    _collect_background_refresh(wait=True)   # rare race: refresh is in flight
+    return token_valid() or refresh_token()
+
+# ── API WRAPPERS ───────────────────────────────────────
+# Partial responses: ask only for what the page reads.  Servers that reject the
+# `fields` parameter (HTTP 400) are re-asked without it, and never sent it again.
+DETAIL_FIELDS = "fields(id,label,type,options(label,value))"
+
+# endpoints / parameters the server turned down; not retried for the life of the process
+_UNSUPPORTED = set()
+_REJECTED    = (400, 404, 405, 501)
+
+def with_fields(path: str, fields: str, **params) -> str:
+    if "fields" not in _UNSUPPORTED:
+        params["fields"] = fields
+    return f"{path}?{urlencode(params)}" if params else path
+
+def _fields_rejected(r: httpx.Response, path: str) -> bool:
+    return r.status_code == 400 and "fields=" in path
+
+def _fields_retried(r: httpx.Response):
+    # only a retry that works without `fields` proves the 400 was about fields
+    if r.is_success or r.status_code == 304:
+        _UNSUPPORTED.add("fields")
+
+def _without_fields(path: str) -> str:
+    parts = urlsplit(path)
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if k != "fields"])
+    return f"{parts.path}?{query}" if query else parts.path
+
+def project_path(proj_id) -> str:
+    return with_fields(f"/project/{proj_id}", DETAIL_FIELDS)
+
+
+def token_fingerprint() -> str:
+    return hashlib.sha1(st.session_state["access_token"].encode()).hexdigest()[:8]
+
+def api_get(path: str):
+    ensure_token()
+    return _cached_get(path, token_fingerprint())
+
+# GETs are memoized per token for CACHE_TTL; reruns triggered by widgets hit the cache.
+# Never cache api_post.
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _cached_get(path: str, token_fingerprint: str):
+    url = f"{API_BASE}{path}"
+    trace("GET %s auth=%s", url, _redacted(st.session_state["access_token"]))
+    headers = {"Authorization": f"Bearer {st.session_state['access_token']}"}
+    # revalidate a TTL-expired entry: a 304 reuses the body we already hold.
+    # Keyed by path alone: session_state is per user, and a refreshed token
+    # must not strand the old entry (one per path, never more)
+    etags = st.session_state.setdefault("_etag_cache", {})
+    cached = etags.get(path)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    r = CLIENT.get(url, headers=headers)
+    if _fields_rejected(r, path):
+        url = f"{API_BASE}{_without_fields(path)}"
+        trace("fields= rejected, retrying GET %s", url)
+        r = CLIENT.get(url, headers=headers)
+        _fields_retried(r)
+    trace("→ %s (%d bytes)", r.status_code, len(r.content))
+    if r.status_code == 304 and cached:
+        return cached[1]
+    if not r.is_success:
+        # r.text decodes the body to str — only worth it on the error path
+        st.error(f"GET {path} failed → {r.status_code}: {r.text[:300]}")
+        st.stop()
+    try:
+        body = orjson.loads(r.content)
+    except orjson.JSONDecodeError:
+        st.error(f"GET {path} returned a non-JSON body")
+        st.stop()
+    if "ETag" in r.headers:
+        etags[path] = (r.headers["ETag"], body)
+    return body
+
+
+def get_projects():
+    """(raw `/project` response, project names, project ids) for the current token.
+
+    Names and ids are parallel tuples.  The selectbox maps a choice back
+    through its label, so a title that repeats gets its id appended to keep
+    every name unique.
+
+    Also held in session_state: a cache_data hit still unpickles a fresh copy,
+    which reruns for the same token and TTL window can skip entirely.
+    """
+    ensure_token()
+    fp = token_fingerprint()
+    sig, stamp, result = st.session_state.get("_projects", (None, 0.0, None))
+    if sig == fp and time.time() - stamp < CACHE_TTL:
+        return result
+    result = _cached_projects(fp)
+    st.session_state["_projects"] = (fp, time.time(), result)
+    return result
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _cached_projects(token_fingerprint: str):
+    path = with_fields("/project", f"id,{FLAVOR.title_key}", limit=100)
+    raw = _cached_get(path, token_fingerprint)
+    data = FLAVOR.unwrap(raw, [])
+    if not isinstance(data, list) or not data:
+        return raw, (), ()
+    titles = [p.get(FLAVOR.title_key, f"Unnamed {i}") for i, p in enumerate(data)]
+    ids = tuple(p["id"] for p in data)
+    seen = Counter(titles)
+    names = tuple(t if seen[t] == 1 else f"{t} (#{pid})" for t, pid in zip(titles, ids))
+    return raw, names, ids
+
+def _post_json(url: str, token: str, payload):
+    # orjson bytes + explicit Content-Type: the client's json= would re-encode with stdlib json
+    return CLIENT.post(
+        url,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        content=orjson.dumps(payload),
+    )
+
+def api_post_many(path: str, payloads: list) -> list:
+    """POST several payloads in one `/batch` call, else in parallel.
+
+    Returns one (ok, body-or-error) pair per payload, in order.
+    """
+    ensure_token()
+    token = st.session_state["access_token"]
+    trace("POST %s ×%d (batched)", path, len(payloads))
+    results = _batch([{"method": "post", "url": path, "body": p} for p in payloads], token)
+    if results is None:   # endpoint rejected outright: nothing ran, safe to resend
+        trace("batch unsupported — %d parallel POSTs", len(payloads))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda p: _post_one(f"{API_BASE}{path}", token, p), payloads))
+    return results
+
+def api_post(path: str, payload: dict):
+    ensure_token()
+    url = f"{API_BASE}{path}"
+    trace("POST %s auth=%s %s", url, _redacted(st.session_state["access_token"]), payload)
+    r = _post_json(url, st.session_state["access_token"], payload)
+    trace("→ %s (%d bytes)", r.status_code, len(r.content))
+    if not r.is_success:
+        st.error(f"POST {path} failed → {r.status_code}: {r.text[:300]}")
+        st.stop()
+    return orjson.loads(r.content)
+
+def refresh_project_cache():
+    """Drop every memoized GET so the next run refetches projects and fields."""
+    _cached_get.clear()
+    _cached_projects.clear()
+    prefetch_project_details.clear()
+    st.session_state.pop("proj_fields", None)
+    st.session_state.pop("_projects", None)
+    st.session_state.pop("norm_fields", None)
+
+# ── BATCH / CONCURRENT HELPERS ─────────────────────────
+# Nothing in this block calls st.* — it runs inside cached functions, worker
+# threads and an event loop.
+
+# `etags` is the session's `_etag_cache` ({path: (etag, body)}), passed in
+# because session_state itself is off limits here.
+
+async def _aget(client: httpx.AsyncClient, path: str, token: str, etags: dict):
+    headers = {"Authorization": f"Bearer {token}"}
+    cached = etags.get(path)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    r = await client.get(f"{API_BASE}{path}", headers=headers)
+    if _fields_rejected(r, path):
+        r = await client.get(f"{API_BASE}{_without_fields(path)}", headers=headers)
+        _fields_retried(r)
+    if r.status_code == 304 and cached:
+        return cached[1]
+    r.raise_for_status()
+    body = orjson.loads(r.content)
+    if "ETag" in r.headers:
+        etags[path] = (r.headers["ETag"], body)
+    return body
+
+async def _gather_gets(paths: list, token: str, etags: dict) -> list:
+    """GET all paths concurrently; failures come back as exception objects."""
+    async with httpx.AsyncClient(http2=True, timeout=10, headers=HTTP_HEADERS) as client:
+        return await asyncio.gather(*[_aget(client, p, token, etags) for p in paths], return_exceptions=True)
+
+def bulk_project_details(proj_ids: tuple, token: str, etags: dict) -> dict:
+    """`GET /project?ids=…` with detail fields → {id: enveloped detail}. Empty if unsupported."""
+    if "bulk" in _UNSUPPORTED:
+        return {}
+    path = with_fields("/project", f"id,{DETAIL_FIELDS}", ids=",".join(map(str, proj_ids)))
+    headers = {"Authorization": f"Bearer {token}"}
+    cached = etags.get(path)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    try:
+        r = CLIENT.get(f"{API_BASE}{path}", headers=headers)
+        if r.status_code in _REJECTED:
+            _UNSUPPORTED.add("bulk")
+        if r.status_code == 304 and cached:
+            body = cached[1]
+        elif r.is_success:
+            body = orjson.loads(r.content)
+            if "ETag" in r.headers:
+                etags[path] = (r.headers["ETag"], body)
+        else:
+            return {}
+        data = FLAVOR.unwrap(body, [])
+    except Exception as exc:
+        logger.debug("bulk project GET failed: %s", exc)
+        return {}
+    # a server that ignores ids/fields returns plain list rows without "fields"
+    wanted = set(proj_ids)
+    found = {p["id"]: {FLAVOR.list_key: p} for p in (data if isinstance(data, list) else [])
+             if isinstance(p, dict) and p.get("id") in wanted and "fields" in p}
+    if not found:   # 2xx but nothing usable: don't re-download the list every miss
+        _UNSUPPORTED.add("bulk")
+    return found
+
+_MAYBE_RAN = " — some of these may already exist in BasicOps; check before retrying"
+
+def _batch(ops: list, token: str):
+    """Graph-style `POST /batch` → one (ok, body) per op, or None if unsupported.
+
+    Only a rejected endpoint returns None.  Any other failure may have run some
+    ops server-side, so every op is reported failed rather than retried.
+    """
+    if "batch" in _UNSUPPORTED:
+        return None
+    try:
+        r = _post_json(f"{API_BASE}/batch", token, ops)
+        if r.status_code in _REJECTED:
+            _UNSUPPORTED.add("batch")
+            return None
+        if not r.is_success:
+            return [(False, f"batch {r.status_code} {r.text[:300]}{_MAYBE_RAN}")] * len(ops)
+        items = FLAVOR.unwrap(orjson.loads(r.content), None)
+    except Exception as exc:
+        logger.debug("batch call failed: %s", exc)
+        return [(False, f"batch failed: {exc}{_MAYBE_RAN}")] * len(ops)
+    if not isinstance(items, list) or len(items) != len(ops):
+        return [(False, f"batch response malformed{_MAYBE_RAN}")] * len(ops)
+    out = []
+    for item in items:
+        item = item or {}
+        body = item.get("body")
+        if isinstance(body, (str, bytes)):
+            try:
+                body = orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        out.append((200 <= item.get("code", 0) < 300, body))
+    return out
+
+def batch_get(paths: list, token: str) -> dict:
+    """Many GETs in one batch call → {path: body}. Empty if unsupported."""
+    results = _batch([{"method": "get", "url": p} for p in paths], token) or []
+    return {path: body for path, (ok, body) in zip(paths, results) if ok}
+
+def _post_one(url: str, token: str, payload) -> tuple:
+    try:
+        r = _post_json(url, token, payload)
+        return (True, orjson.loads(r.content)) if r.is_success else (False, f"{r.status_code} {r.text[:300]}")
+    except Exception as exc:
+        return False, str(exc)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def prefetch_project_details(token_fp: str, proj_ids: tuple, _token: str, _etags: dict) -> dict:
+    """`/project/{id}` for many projects, cheapest route first.
+
+    One bulk `?ids=` GET, then one `/batch` call for what it missed, then
+    concurrent GETs for the rest.  Projects whose fetch failed are left out.
+    The bulk and concurrent GETs revalidate through `_etags`; `/batch` ops
+    carry no per-op headers, so they always refetch.
+    """
+    paths = {pid: project_path(pid) for pid in proj_ids}
+    details = bulk_project_details(proj_ids, _token, _etags)
+    missing = [pid for pid in proj_ids if pid not in details]
+    if missing:
+        batched = batch_get([paths[pid] for pid in missing], _token)
+        details.update({pid: batched[paths[pid]] for pid in missing if paths[pid] in batched})
+        missing = [pid for pid in proj_ids if pid not in details]
+    if not missing:
+        return details
+    results = _run_async(_gather_gets([paths[pid] for pid in missing], _token, _etags))
+    for pid, res in zip(missing, results):
+        if isinstance(res, Exception):
+            logger.debug("prefetch /project/%s failed: %s", pid, res)
+        else:
+            details[pid] = res
+    return details
+
+# ── PROJECT FIELDS ─────────────────────────────────────
+# Fields per project live in session_state, so switching projects is a dict lookup.
+PREFETCH_MAX = 16   # project details warmed concurrently after the list loads
+
+def warm_project_fields(proj_ids):
+    """Prefetch fields for the first PREFETCH_MAX projects not yet in the session map."""
+    proj_fields = st.session_state.setdefault("proj_fields", {})
+    warm_ids = tuple(proj_ids)[:PREFETCH_MAX]
+    if all(pid in proj_fields for pid in warm_ids):
+        return
+    ensure_token()
+    warm = prefetch_project_details(token_fingerprint(), warm_ids, st.session_state["access_token"],
+                                    st.session_state.setdefault("_etag_cache", {}))
+    for pid, resp in warm.items():
+        proj_fields[pid] = FLAVOR.unwrap(resp, {}).get("fields", [])
+
+def project_fields(proj_id) -> list:
+    """A project's custom fields: session map, else detail GET, else `/fields`."""
+    proj_fields = st.session_state.setdefault("proj_fields", {})
+    fields = proj_fields.get(proj_id)
+    if fields is None:   # not prefetched — single-project GET
+        p_detail = FLAVOR.unwrap(api_get(project_path(proj_id)), {})
+        fields = proj_fields[proj_id] = p_detail.get("fields", [])
+    # fallback: explicit fields endpoint if inline empty
+    if not fields:
+        field_resp = api_get(f"/project/{proj_id}/fields")
+        fields = FLAVOR.unwrap(field_resp, field_resp)
+    return fields
+
+# ── OAUTH CODE FLOW ────────────────────────────────────
+
+def handle_oauth_callback():
+    """Exchange `?code=` for tokens on the redirect back from BasicOps."""
+    if "code" not in st.query_params:
+        return   # a code is exchanged even over restored tokens: it is the newer login
+    # codes are single-use: drop it from the URL up front so no later rerun
+    # (e.g. ticking Debug after a failure) POSTs the same dead code again
+    code = st.query_params["code"]
+    del st.query_params["code"]
+    trace("OAuth code received")
+    tok = exchange("authorization_code", code=code)
+    if tok.get("access_token"):
+        st.session_state.pop("session_expires", None)   # new login, new 14-day window
+        save_tokens(tok)
+        st.query_params.clear()
+        st.rerun()   # same websocket, no full page reload
+    st.error("Token exchange failed — try connecting again")